@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+"""Run ipatool benchmark scenarios offline
+
+Every scenario runs ipatool against a freshly generated synthetic
+repository (see synthrepo.py) and a local GitHub & Pagure stand-in (see
+standin.py) with simulated latency. For each scenario the wall time,
+the number of API requests and the number of forked processes (taken
+from ipatool's --profile trace) are reported.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import standin
+import synthrepo
+
+IPATOOL = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, 'ipatool')
+
+TICKET_URL = 'https://pagure.io/freeipa/issue/'
+
+
+class Bench(object):
+    """One run of one scenario: workspace, stand-in server and config"""
+    def __init__(self, args, root):
+        self.args = args
+        self.root = root
+        self.workspace = synthrepo.generate(
+            os.path.join(root, 'repo'), branches=args.branches,
+            history=args.history, prs=args.prs, pr_commits=args.pr_commits,
+            ticket_url=TICKET_URL)
+        self.stable_branches = self.workspace.branches[1:]
+        self.patchdir = os.path.join(root, 'patches')
+        os.makedirs(self.patchdir)
+        self.server = standin.Standin(latency=args.latency / 1000,
+                                      graphql=not args.no_graphql)
+        self.populate()
+        self.server.start()
+        self.config_path = os.path.join(root, 'ipatool.yaml')
+        with open(self.config_path, 'w') as f:
+            # JSON is valid YAML
+            json.dump(self.config(), f, indent=1)
+
+    def populate(self):
+        """PR 1 is ACKed for master & stable branches, PR 2 is pushed,
+        every third PR is closed; each PR has a Pagure ticket"""
+        start = datetime.datetime.now(datetime.timezone.utc)
+        for pr in self.workspace.pull_requests:
+            labels = ['ack']
+            state, merged = 'open', False
+            if pr.number == 1:
+                labels.extend(self.stable_branches)
+            elif pr.number == 2 or pr.number % 3 == 0:
+                labels.append('pushed')
+                state, merged = 'closed', True
+            self.server.add_pull_request(
+                pr.number, pr.title, pr.base, pr.commits, labels=labels,
+                state=state, merged=merged, updated_at=start +
+                datetime.timedelta(minutes=pr.number - len(
+                    self.workspace.pull_requests)))
+            self.server.add_ticket(pr.ticket, 'Ticket for %s' % pr.title,
+                                   'FreeIPA 4.7',
+                                   custom_fields={'reviewer': 'alice'})
+
+    def config(self):
+        return {
+            'clean-repo-path': self.workspace.clean,
+            'remote': 'origin',
+            'patchdir': self.patchdir,
+            'apply-mode': self.args.apply_mode,
+            'ticket-url': TICKET_URL,
+            'commit-url': 'https://pagure.io/freeipa/c/',
+            'bugzilla-bug-url': 'https://bugzilla.redhat.com/show_bug.cgi?id=',
+            'jira-ticket-url': 'https://issues.redhat.com/browse/RHEL-',
+            'pagure-repository': 'freeipa',
+            'pagure-token': 'bench',
+            'pagure-url': self.server.url,
+            'username': 'carol',
+            'max-workers': 8,
+            'cache-path': os.path.join(self.root, 'cache.sqlite'),
+            'update-issue': 'yes',
+            'close-issue': 'ask',
+            'gh-token': 'bench',
+            'gh-repo': 'freeipa/freeipa',
+            'gh-fork-remote': 'fork',
+            'gh-url': self.server.url,
+        }
+
+    def ipatool(self, argv, trace=None):
+        """Run ipatool answering "y" to all prompts; return (seconds, result)
+        """
+        command = [sys.executable, self.args.ipatool,
+                   '--config', self.config_path, '--color=never']
+        if trace:
+            command.append('--profile=%s' % trace)
+        start = time.perf_counter()
+        result = subprocess.run(
+            command + argv, input='y\n' * 50, cwd=self.workspace.clean,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True, timeout=600)
+        return time.perf_counter() - start, result
+
+    def measure(self, argv, check):
+        trace = os.path.join(self.root, 'trace.json')
+        self.server.reset_counts()
+        seconds, result = self.ipatool(argv, trace)
+        forks = cached = 0
+        if os.path.exists(trace):
+            with open(trace) as f:
+                for event in json.load(f)['traceEvents']:
+                    if event['cat'] == 'process':
+                        if event['args'].get('cached'):
+                            cached += 1
+                        else:
+                            forks += 1
+        ok = result.returncode == 0 and check(self)
+        if not ok and self.args.verbose:
+            print(result.stdout)
+        return {
+            'wall': seconds,
+            'github': self.server.total('github'),
+            'graphql': self.server.total('graphql'),
+            'pagure': self.server.total('pagure'),
+            'forks': forks,
+            'cached': cached,
+            'ok': ok,
+        }
+
+    def close(self):
+        self.server.stop()
+
+    def branch_sha(self, repo, branch):
+        return subprocess.check_output(
+            ['git', '--git-dir', repo, 'rev-parse', branch],
+            universal_newlines=True).strip()
+
+
+# Scenarios: prepare the Bench, return ipatool argv & a success check
+
+def scenario_push(bench):
+    pr = bench.workspace.pull_requests[0]
+    synthrepo.write_patches(pr, bench.patchdir)
+    old = bench.branch_sha(bench.workspace.upstream, 'master')
+    argv = ['push']
+    for branch in bench.workspace.branches:
+        argv.extend(['-b', branch])
+
+    def check(bench):
+        new = bench.branch_sha(bench.workspace.upstream, 'master')
+        return (new != old and
+                bench.server.tickets[pr.ticket]['status'] == 'Closed')
+    return argv, check
+
+
+def scenario_pr_list(bench):
+    return ['pr-list'], lambda bench: True
+
+
+def scenario_pr_list_all(bench):
+    return ['pr-list', '--state=all'], lambda bench: True
+
+
+def scenario_pr_list_warm(bench):
+    bench.ipatool(['pr-list', '--state=all'])
+    return ['pr-list', '--state=all'], lambda bench: True
+
+
+def scenario_pr_push(bench):
+    count = len(bench.server.pulls)
+
+    def check(bench):
+        return (bench.server.pulls[1]['state'] == 'closed' and
+                len(bench.server.pulls) == count + len(bench.stable_branches))
+    return ['pr-push', '1', '--autobackport'], check
+
+
+def scenario_backport(bench):
+    count = len(bench.server.pulls)
+    argv = ['backport', '2']
+    for branch in bench.stable_branches:
+        argv.extend(['-b', branch])
+
+    def check(bench):
+        return len(bench.server.pulls) == count + len(bench.stable_branches)
+    return argv, check
+
+
+SCENARIOS = {
+    'push': scenario_push,
+    'pr-list': scenario_pr_list,
+    'pr-list-all': scenario_pr_list_all,
+    'pr-list-warm': scenario_pr_list_warm,
+    'pr-push': scenario_pr_push,
+    'backport': scenario_backport,
+}
+
+
+def run_scenario(args, name):
+    """Run a scenario args.repeat times; return the median wall time
+    and the counts of the first run"""
+    runs = []
+    for i in range(args.repeat):
+        root = tempfile.mkdtemp(prefix='ipatool-bench-')
+        try:
+            bench = Bench(args, root)
+            try:
+                argv, check = SCENARIOS[name](bench)
+                runs.append(bench.measure(argv, check))
+            finally:
+                bench.close()
+        finally:
+            if args.keep:
+                print('Kept %s' % root)
+            else:
+                shutil.rmtree(root)
+    result = dict(runs[0])
+    result['scenario'] = name
+    result['wall'] = statistics.median(run['wall'] for run in runs)
+    result['ok'] = all(run['ok'] for run in runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark ipatool against local GitHub & Pagure '
+                    'stand-ins and synthetic repositories')
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help='scenarios to run (default: all): %s' %
+                             ', '.join(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per scenario; the median time is shown')
+    parser.add_argument('--latency', type=float, default=50,
+                        help='milliseconds added to every API request')
+    parser.add_argument('--branches', type=int, default=3,
+                        help='number of stable branches')
+    parser.add_argument('--history', type=int, default=2000,
+                        help='number of commits on master')
+    parser.add_argument('--prs', type=int, default=30,
+                        help='number of pull requests')
+    parser.add_argument('--pr-commits', type=int, default=5,
+                        help='number of commits in each pull request')
+    parser.add_argument('--apply-mode', default='checkout',
+                        help='apply-mode setting for ipatool')
+    parser.add_argument('--no-graphql', action='store_true',
+                        help='make GraphQL queries fail (test REST fallback)')
+    parser.add_argument('--ipatool', default=IPATOOL,
+                        help='ipatool script to benchmark')
+    parser.add_argument('--json', metavar='FILE',
+                        help='also save the results to FILE')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the generated workspaces')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='show ipatool output of failed runs')
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario: %s' % name)
+
+    print('branches=%s history=%s prs=%s pr-commits=%s latency=%sms '
+          'apply-mode=%s' % (args.branches, args.history, args.prs,
+                             args.pr_commits, args.latency, args.apply_mode))
+    print('%-14s %8s %7s %8s %7s %6s %7s  %s' % (
+        'Scenario', 'Wall s', 'GitHub', 'GraphQL', 'Pagure', 'Forks',
+        'Cached', 'Result'))
+    results = []
+    for name in names:
+        result = run_scenario(args, name)
+        results.append(result)
+        print('%-14s %8.2f %7d %8d %7d %6d %7d  %s' % (
+            name, result['wall'], result['github'], result['graphql'],
+            result['pagure'], result['forks'], result['cached'],
+            'ok' if result['ok'] else 'FAILED'))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': vars(args), 'results': results}, f,
+                      indent=1)
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
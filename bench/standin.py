@@ -0,0 +1,553 @@
+"""Local stand-in for the GitHub and Pagure APIs used by ipatool
+
+Serves the GitHub REST endpoints (as a GitHub Enterprise server, under
+/api/v3), the GraphQL queries ipatool sends, and the Pagure issue
+endpoints (under /api/0) from in-memory data. Every request can be delayed
+to simulate network latency, and requests are counted per API.
+
+Point ipatool at it with the gh-url and pagure-url configuration options.
+"""
+
+import collections
+import datetime
+import http.server
+import json
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+
+
+def timestamp(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class Standin(object):
+    """GitHub & Pagure stand-in server
+
+    latency - seconds to wait before answering each request
+    graphql - if false, GraphQL queries fail (ipatool then uses REST)
+
+    Data is added with add_pull_request() and add_ticket(); `counts` maps
+    "api METHOD endpoint" to the number of requests received.
+    """
+    def __init__(self, repo_name='freeipa/freeipa',
+                 pagure_repository='freeipa', latency=0.0, graphql=True,
+                 login='ipatool-bench'):
+        self.repo_name = repo_name
+        self.pagure_repository = pagure_repository
+        self.latency = latency
+        self.graphql = graphql
+        self.login = login
+        self.pulls = collections.OrderedDict()
+        self.tickets = {}
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+        self.server = None
+
+    # Server
+
+    def start(self):
+        standin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_request(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, headers, content = standin.handle(
+                    self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      Handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    @property
+    def api_url(self):
+        return self.url + '/api/v3'
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts.clear()
+
+    def total(self, api):
+        """Number of requests received by api (github, graphql, pagure)"""
+        return sum(n for key, n in self.counts.items()
+                   if key.split()[0] == api)
+
+    # Data
+
+    def add_pull_request(self, number, title, base, commits, body='',
+                         labels=(), state='open', merged=False,
+                         user='developer', ci='success', updated_at=None):
+        """Add a pull request
+
+        commits - list of dicts with sha, parents, message, patch (the
+                  `git format-patch` output), author_name, author_email
+        ci - state of the combined status of the head commit
+        """
+        self.pulls[number] = {
+            'number': number, 'title': title, 'body': body, 'base': base,
+            'commits': list(commits), 'labels': list(labels),
+            'state': state, 'merged': merged, 'user': user, 'ci': ci,
+            'head_ref': 'pr%d' % number, 'comments': [],
+            'created_at': updated_at or now(),
+            'updated_at': updated_at or now(),
+        }
+
+    def add_ticket(self, number, title, milestone, status='Open',
+                   custom_fields=None, content=''):
+        """Add a Pagure issue; custom_fields maps names to values"""
+        self.tickets[number] = {
+            'id': number, 'title': title, 'content': content,
+            'milestone': milestone, 'status': status, 'close_status': None,
+            'custom_fields': [
+                {'name': name, 'value': value, 'key_type': 'text'}
+                for name, value in (custom_fields or {}).items()],
+            'comments': [],
+        }
+
+    # Request dispatch
+
+    def handle(self, method, path, headers, body):
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urllib.parse.urlsplit(path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        path = parsed.path.rstrip('/')
+        for api, regex, endpoint in self.routes:
+            match = re.match(regex + '$', path)
+            if match and (endpoint.split()[0] == method):
+                with self.lock:
+                    self.counts['%s %s' % (api, endpoint)] += 1
+                    handler = getattr(self, 'h_' + endpoint.split()[1])
+                    try:
+                        result = handler(query, body, headers,
+                                         *match.groups())
+                    except KeyError:
+                        result = 404, {'message': 'Not Found'}
+                return self.respond(*result)
+        with self.lock:
+            self.counts['unknown %s %s' % (method, path)] += 1
+        return self.respond(404, {'message': 'Not Found'})
+
+    def respond(self, status, content, headers=None):
+        headers = dict(headers or {})
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+            headers.setdefault('Content-Type', 'text/plain; charset=utf-8')
+        else:
+            content = json.dumps(content).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+        headers.setdefault('X-RateLimit-Remaining', '5000')
+        headers.setdefault('X-RateLimit-Reset', str(int(time.time()) + 3600))
+        return status, headers, content
+
+    R = r'/api/v3/repos/([^/]+/[^/]+)'
+    P = r'/api/0/([^/]+)/issue/(\d+)'
+    routes = [
+        ('github', r'/api/v3/user', 'GET user'),
+        ('github', R, 'GET repository'),
+        ('github', R + r'/pulls', 'GET pulls'),
+        ('github', R + r'/pulls', 'POST create_pull'),
+        ('github', R + r'/pulls/(\d+)', 'GET pull'),
+        ('github', R + r'/pulls/(\d+)/commits', 'GET pull_commits'),
+        ('github', R + r'/commits/(\w+)', 'GET commit'),
+        ('github', R + r'/commits/(\w+)/status', 'GET status'),
+        ('github', R + r'/commits/(\w+)/check-runs', 'GET check_runs'),
+        ('github', R + r'/issues/(\d+)', 'GET issue'),
+        ('github', R + r'/issues/(\d+)', 'PATCH edit_issue'),
+        ('github', R + r'/issues/(\d+)/labels', 'GET labels'),
+        ('github', R + r'/issues/(\d+)/labels', 'POST add_labels'),
+        ('github', R + r'/issues/(\d+)/labels/([^/]+)', 'DELETE label'),
+        ('github', R + r'/issues/(\d+)/comments', 'POST comment'),
+        # GitHub Enterprise serves GraphQL outside the REST root /api/v3
+        ('graphql', r'/api/graphql', 'POST graphql'),
+        ('pagure', P, 'GET ticket'),
+        ('pagure', P + r'/comment', 'POST ticket_comment'),
+        ('pagure', P + r'/status', 'POST ticket_status'),
+    ]
+
+    # GitHub payloads
+
+    def api(self, *parts):
+        return '/'.join([self.api_url] + [str(p) for p in parts])
+
+    def html(self, *parts):
+        return '/'.join([self.url] + [str(p) for p in parts])
+
+    def user_payload(self, login):
+        url = self.api('users', login)
+        payload = {'login': login, 'id': zlib.crc32(login.encode()),
+                   'type': 'User', 'url': url, 'html_url': self.html(login),
+                   'gravatar_id': '', 'avatar_url': url}
+        for name in ('events', 'followers', 'following', 'gists',
+                     'organizations', 'received_events', 'repos', 'starred',
+                     'subscriptions'):
+            payload['%s_url' % name] = '%s/%s' % (url, name)
+        return payload
+
+    def repository_payload(self):
+        owner, name = self.repo_name.split('/')
+        url = self.api('repos', self.repo_name)
+        payload = {
+            'id': 1, 'name': name, 'full_name': self.repo_name,
+            'owner': self.user_payload(owner), 'private': False,
+            'fork': False, 'description': '', 'url': url,
+            'html_url': self.html(self.repo_name),
+            'archived': False, 'default_branch': 'master',
+            'created_at': timestamp(now()), 'updated_at': timestamp(now()),
+            'pushed_at': timestamp(now()), 'homepage': '', 'language': 'C',
+            'mirror_url': None, 'size': 0, 'network_count': 0,
+            'open_issues_count': 0, 'forks_count': 0, 'stargazers_count': 0,
+            'subscribers_count': 0, 'watchers_count': 0,
+            'has_downloads': False, 'has_issues': True, 'has_pages': False,
+            'has_projects': False, 'has_wiki': False,
+            'clone_url': url, 'git_url': url, 'ssh_url': url, 'svn_url': url,
+            'permissions': {'admin': True, 'push': True, 'pull': True},
+        }
+        for name in ('archive', 'assignees', 'blobs', 'branches',
+                     'collaborators', 'comments', 'commits', 'compare',
+                     'contents', 'contributors', 'deployments', 'downloads',
+                     'events', 'forks', 'git_commits', 'git_refs', 'git_tags',
+                     'hooks', 'issue_comment', 'issue_events', 'issues',
+                     'keys', 'labels', 'languages', 'merges', 'milestones',
+                     'notifications', 'pulls', 'releases', 'stargazers',
+                     'statuses', 'subscribers', 'subscription', 'tags',
+                     'teams', 'trees'):
+            payload['%s_url' % name] = '%s/%s' % (url, name)
+        return payload
+
+    def label_payload(self, name):
+        return {'name': name, 'color': '%06x' % (zlib.crc32(name.encode()) & 0xffffff),
+                'url': self.api('repos', self.repo_name, 'labels', name),
+                'description': None, 'id': 1, 'default': False}
+
+    def pull_payload(self, pr, full=False):
+        number = pr['number']
+        url = self.api('repos', self.repo_name, 'pulls', number)
+        issue_url = self.api('repos', self.repo_name, 'issues', number)
+        head_sha = pr['commits'][-1]['sha']
+        base_sha = pr['commits'][0]['parents'][0]
+        repository = self.repository_payload()
+        payload = {
+            'id': number, 'number': number, 'url': url,
+            'html_url': self.html(self.repo_name, 'pull', number),
+            'diff_url': url + '.diff', 'patch_url': url + '.patch',
+            'issue_url': issue_url, 'commits_url': url + '/commits',
+            'comments_url': issue_url + '/comments',
+            'review_comments_url': url + '/comments',
+            'review_comment_url': url + '/comments{/number}',
+            'statuses_url': self.api('repos', self.repo_name, 'statuses',
+                                     head_sha),
+            'state': pr['state'], 'title': pr['title'], 'body': pr['body'],
+            'body_html': '', 'body_text': '', 'locked': False,
+            'active_lock_reason': None,
+            'user': self.user_payload(pr['user']),
+            'assignee': None, 'assignees': [],
+            'labels': [self.label_payload(l) for l in pr['labels']],
+            'created_at': timestamp(pr['created_at']),
+            'updated_at': timestamp(pr['updated_at']),
+            'closed_at': None if pr['state'] == 'open' else timestamp(
+                pr['updated_at']),
+            'merged_at': timestamp(pr['updated_at']) if pr['merged'] else None,
+            'merge_commit_sha': None,
+            'head': {'label': '%s:%s' % (pr['user'], pr['head_ref']),
+                     'ref': pr['head_ref'], 'sha': head_sha,
+                     'user': self.user_payload(pr['user']),
+                     'repo': repository},
+            'base': {'label': 'freeipa:%s' % pr['base'], 'ref': pr['base'],
+                     'sha': base_sha, 'user': repository['owner'],
+                     'repo': repository},
+            '_links': {'self': {'href': url}},
+        }
+        if full:
+            payload.update({
+                'merged': pr['merged'], 'mergeable': True,
+                'mergeable_state': 'clean', 'merged_by': None,
+                'comments': len(pr['comments']), 'review_comments': 0,
+                'commits': len(pr['commits']), 'additions': 0,
+                'deletions': 0, 'changed_files': 0, 'draft': False,
+                'author_association': 'CONTRIBUTOR',
+                'requested_reviewers': [], 'requested_teams': [],
+            })
+        return payload
+
+    def issue_payload(self, pr):
+        number = pr['number']
+        url = self.api('repos', self.repo_name, 'issues', number)
+        return {
+            'id': number, 'number': number, 'url': url,
+            'html_url': self.html(self.repo_name, 'issues', number),
+            'labels_url': url + '/labels{/name}',
+            'comments_url': url + '/comments', 'events_url': url + '/events',
+            'title': pr['title'], 'body': pr['body'], 'body_html': '',
+            'body_text': '', 'state': pr['state'], 'locked': False,
+            'user': self.user_payload(pr['user']), 'assignee': None,
+            'assignees': [], 'milestone': None, 'closed_by': None,
+            'labels': [self.label_payload(l) for l in pr['labels']],
+            'comments': len(pr['comments']),
+            'created_at': timestamp(pr['created_at']),
+            'updated_at': timestamp(pr['updated_at']),
+            'closed_at': None if pr['state'] == 'open' else timestamp(
+                pr['updated_at']),
+            'pull_request': {'url': self.api('repos', self.repo_name,
+                                             'pulls', number)},
+        }
+
+    def commit_payload(self, commit):
+        url = self.api('repos', self.repo_name, 'commits', commit['sha'])
+        person = {'name': commit['author_name'],
+                  'email': commit['author_email'],
+                  'date': timestamp(now())}
+        return {
+            'sha': commit['sha'], 'url': url,
+            'html_url': self.html(self.repo_name, 'commit', commit['sha']),
+            'comments_url': url + '/comments',
+            'author': None, 'committer': None,
+            'parents': [{'sha': p, 'url': self.api(
+                'repos', self.repo_name, 'commits', p)}
+                for p in commit['parents']],
+            'commit': {
+                'url': url, 'sha': commit['sha'],
+                'message': commit['message'], 'author': person,
+                'committer': person,
+                'tree': {'sha': commit['sha'], 'url': url},
+                'comment_count': 0,
+            },
+        }
+
+    def find_commit(self, sha):
+        for pr in self.pulls.values():
+            for commit in pr['commits']:
+                if commit['sha'] == sha:
+                    return pr, commit
+        raise KeyError(sha)
+
+    def paginate(self, query, items, url):
+        per_page = int(query.get('per_page', 30))
+        page = int(query.get('page', 1))
+        start = (page - 1) * per_page
+        headers = {}
+        if start + per_page < len(items):
+            next_query = dict(query, page=page + 1)
+            headers['Link'] = '<%s?%s>; rel="next"' % (
+                url, urllib.parse.urlencode(next_query))
+        return items[start:start + per_page], headers
+
+    # GitHub handlers; each returns (status, content[, headers])
+
+    def h_user(self, query, body, headers):
+        payload = self.user_payload(self.login)
+        payload.update({
+            'name': self.login, 'email': None, 'bio': None, 'blog': None,
+            'company': None, 'location': None, 'hireable': False,
+            'followers': 0, 'following': 0, 'public_gists': 0,
+            'public_repos': 0, 'created_at': timestamp(now()),
+            'updated_at': timestamp(now()),
+        })
+        return 200, payload
+
+    def h_repository(self, query, body, headers, repo):
+        if repo != self.repo_name:
+            raise KeyError(repo)
+        return 200, self.repository_payload()
+
+    def h_pulls(self, query, body, headers, repo):
+        state = query.get('state', 'open')
+        pulls = [pr for pr in self.pulls.values()
+                 if state == 'all' or pr['state'] == state]
+        key = 'updated_at' if query.get('sort') == 'updated' else 'created_at'
+        pulls.sort(key=lambda pr: (pr[key], pr['number']),
+                   reverse=query.get('direction', 'desc') == 'desc')
+        items, link = self.paginate(
+            query, pulls, self.api('repos', repo, 'pulls'))
+        return 200, [self.pull_payload(pr) for pr in items], link
+
+    def h_pull(self, query, body, headers, repo, number):
+        return 200, self.pull_payload(self.pulls[int(number)], full=True)
+
+    def h_pull_commits(self, query, body, headers, repo, number):
+        commits = self.pulls[int(number)]['commits']
+        items, link = self.paginate(
+            query, commits, self.api('repos', repo, 'pulls', number,
+                                     'commits'))
+        return 200, [self.commit_payload(c) for c in items], link
+
+    def h_commit(self, query, body, headers, repo, sha):
+        pr, commit = self.find_commit(sha)
+        if 'patch' in headers.get('Accept', ''):
+            return 200, commit['patch']
+        return 200, self.commit_payload(commit)
+
+    def h_status(self, query, body, headers, repo, sha):
+        pr, commit = self.find_commit(sha)
+        return 200, {
+            'state': pr['ci'], 'sha': sha, 'total_count': 1,
+            'statuses': [{'state': pr['ci'], 'context': 'bench-ci'}],
+        }
+
+    def h_check_runs(self, query, body, headers, repo, sha):
+        return 200, {'total_count': 0, 'check_runs': []}
+
+    def h_issue(self, query, body, headers, repo, number):
+        return 200, self.issue_payload(self.pulls[int(number)])
+
+    def h_edit_issue(self, query, body, headers, repo, number):
+        pr = self.pulls[int(number)]
+        data = json.loads(body or b'{}')
+        if 'state' in data:
+            pr['state'] = data['state']
+        pr['updated_at'] = now()
+        return 200, self.issue_payload(pr)
+
+    def h_labels(self, query, body, headers, repo, number):
+        pr = self.pulls[int(number)]
+        return 200, [self.label_payload(l) for l in pr['labels']]
+
+    def h_add_labels(self, query, body, headers, repo, number):
+        pr = self.pulls[int(number)]
+        data = json.loads(body or b'[]')
+        if isinstance(data, dict):
+            data = data.get('labels', [])
+        for name in data:
+            if name not in pr['labels']:
+                pr['labels'].append(name)
+        pr['updated_at'] = now()
+        return 200, [self.label_payload(l) for l in pr['labels']]
+
+    def h_label(self, query, body, headers, repo, number, name):
+        pr = self.pulls[int(number)]
+        pr['labels'].remove(urllib.parse.unquote(name))
+        pr['updated_at'] = now()
+        return 200, [self.label_payload(l) for l in pr['labels']]
+
+    def h_comment(self, query, body, headers, repo, number):
+        pr = self.pulls[int(number)]
+        text = json.loads(body)['body']
+        pr['comments'].append(text)
+        pr['updated_at'] = now()
+        url = self.api('repos', repo, 'issues', 'comments',
+                       len(pr['comments']))
+        return 201, {
+            'id': len(pr['comments']), 'url': url, 'html_url': url,
+            'issue_url': self.api('repos', repo, 'issues', number),
+            'body': text, 'body_html': '', 'body_text': '',
+            'user': self.user_payload(self.login),
+            'author_association': 'MEMBER',
+            'created_at': timestamp(now()), 'updated_at': timestamp(now()),
+        }
+
+    def h_create_pull(self, query, body, headers, repo):
+        data = json.loads(body)
+        # the new PR has the commits of the backported PR (sha1s differ in
+        # reality, but are not looked at again)
+        number = max(self.pulls or [0]) + 1
+        login, head_ref = data['head'].split(':')
+        original = re.match(r'backport_pr(\d+)_', head_ref)
+        commits = self.pulls[int(original.group(1))]['commits']
+        self.add_pull_request(number, data['title'], data['base'], commits,
+                              body=data.get('body') or '', user=login)
+        self.pulls[number]['head_ref'] = head_ref
+        return 201, self.pull_payload(self.pulls[number], full=True)
+
+    # GraphQL
+
+    def graphql_node(self, pr):
+        if pr['merged']:
+            state = 'MERGED'
+        else:
+            state = pr['state'].upper()
+        return {
+            'number': pr['number'], 'title': pr['title'],
+            'url': self.html(self.repo_name, 'pull', pr['number']),
+            'state': state, 'merged': pr['merged'],
+            'updatedAt': timestamp(pr['updated_at']),
+            'labels': {'nodes': [
+                {'name': l, 'color': self.label_payload(l)['color']}
+                for l in pr['labels']]},
+            'commits': {'nodes': [{'commit': {'statusCheckRollup': {
+                'contexts': {'nodes': [{
+                    '__typename': 'StatusContext',
+                    'state': pr['ci'].upper()}]}}}}]},
+        }
+
+    def h_graphql(self, query, body, headers):
+        request = json.loads(body)
+        text = request['query']
+        variables = request.get('variables') or {}
+        if not self.graphql:
+            return 200, {'errors': [{'message': 'GraphQL disabled'}]}
+        if 'pullRequests(' in text:
+            states = variables.get('states')
+            order = variables.get('order') or re.search(
+                r'field: (\w+)', text).group(1)
+            key = {'UPDATED_AT': 'updated_at'}.get(order, 'created_at')
+            pulls = [pr for pr in self.pulls.values()
+                     if not states or
+                     self.graphql_node(pr)['state'] in states]
+            pulls.sort(key=lambda pr: (pr[key], pr['number']), reverse=True)
+            start = int(variables.get('cursor') or 0)
+            count = variables.get('count', 100)
+            page = pulls[start:start + count]
+            return 200, {'data': {'repository': {'pullRequests': {
+                'pageInfo': {'hasNextPage': start + count < len(pulls),
+                             'endCursor': str(start + count)},
+                'nodes': [self.graphql_node(pr) for pr in page],
+            }}}}
+        fields = re.findall(r'(\w+): pullRequest\(number: (\d+)\)', text)
+        if fields:
+            return 200, {'data': {'repository': {
+                alias: (self.graphql_node(self.pulls[int(number)])
+                        if int(number) in self.pulls else None)
+                for alias, number in fields}}}
+        return 200, {'errors': [{'message': 'Unsupported query'}]}
+
+    # Pagure handlers
+
+    def h_ticket(self, query, body, headers, repo, number):
+        ticket = dict(self.tickets[int(number)])
+        ticket['comments'] = [{'comment': c} for c in ticket['comments']]
+        return 200, ticket
+
+    def h_ticket_comment(self, query, body, headers, repo, number):
+        data = urllib.parse.parse_qs(body.decode('utf-8'))
+        self.tickets[int(number)]['comments'].append(data['comment'][0])
+        return 200, {'message': 'Comment added'}
+
+    def h_ticket_status(self, query, body, headers, repo, number):
+        data = urllib.parse.parse_qs(body.decode('utf-8'))
+        ticket = self.tickets[int(number)]
+        ticket['status'] = data['status'][0]
+        if 'close_status' in data:
+            ticket['close_status'] = data['close_status'][0]
+        return 200, {'message': 'Successfully edited issue #%s' % number}
@@ -0,0 +1,204 @@
+"""Generate synthetic git repositories for ipatool benchmarks
+
+A generated workspace contains:
+
+* upstream.git - bare "upstream" repository with a master branch of
+  `history` commits, and `branches` stable branches (ipa-4-N) forked from
+  it. Each stable branch has commits of its own.
+* fork.git - empty bare repository, the GitHub fork of a developer
+* clean - clone of upstream.git with the fork as the "fork" remote
+  (the clean-repo-path of ipatool)
+* pull requests - `prs` series of `pr_commits` commits on top of master,
+  stored under refs/pr/N in upstream.git, with their patches; they apply
+  to master and to all stable branches
+
+All commits are written with a single `git fast-import` per repository,
+so large histories are generated quickly.
+"""
+
+import collections
+import os
+import random
+import re
+import subprocess
+
+CONTRIBUTORS = [
+    ('Alice Reviewer', 'alice@example.com'),
+    ('Bob Developer', 'bob@example.com'),
+    ('Carol Maintainer', 'carol@example.com'),
+    ('Dave Contributor', 'dave@example.com'),
+]
+
+FILE_LINES = 40
+
+# A generated pull request; commits are dicts as taken by
+# Standin.add_pull_request
+PullRequest = collections.namedtuple(
+    'PullRequest', 'number title base ticket commits')
+
+Workspace = collections.namedtuple(
+    'Workspace', 'root upstream fork clean branches pull_requests')
+
+
+def git(*args, cwd=None, stdin=None):
+    result = subprocess.run(
+        ('git',) + args, cwd=cwd, input=stdin, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return result.stdout
+
+
+class FastImport(object):
+    """Writes a git fast-import stream of text files and commits"""
+    def __init__(self, seed, start_time=1600000000):
+        self.chunks = []
+        self.marks = 0
+        self.time = start_time
+        self.random = random.Random(seed)
+
+    def data(self, text):
+        raw = text.encode('utf-8')
+        self.chunks.append(b'data %d\n%s\n' % (len(raw), raw))
+
+    def commit(self, ref, message, files, parent=None, author=None):
+        """Add a commit of files (path: content) to ref; return its mark"""
+        self.marks += 1
+        self.time += 60
+        name, email = author or self.random.choice(CONTRIBUTORS)
+        ident = '%s <%s> %d +0000' % (name, email, self.time)
+        self.chunks.append(b'commit %s\nmark :%d\n' % (ref.encode(),
+                                                        self.marks))
+        self.chunks.append(b'author %s\ncommitter %s\n' % (
+            ident.encode(), ident.encode()))
+        self.data(message)
+        if parent:
+            self.chunks.append(b'from :%d\n' % parent)
+        for path, content in sorted(files.items()):
+            self.chunks.append(b'M 100644 inline %s\n' % path.encode())
+            self.data(content)
+        self.chunks.append(b'\n')
+        return self.marks
+
+    def run(self, git_dir):
+        git('--git-dir', git_dir, 'fast-import', '--quiet',
+            stdin=b''.join(self.chunks))
+
+
+def file_content(lines):
+    return ''.join('%s\n' % line for line in lines)
+
+
+def generate(root, branches=3, history=200, prs=10, pr_commits=3,
+             files=50, seed=0, ticket_url='https://pagure.io/freeipa/issue/'):
+    """Create a workspace in root (which must not exist); return Workspace
+
+    PR n modifies its own files, so all PRs apply independently; stable
+    branches only differ from master in the VERSION file.
+    """
+    os.makedirs(root)
+    upstream = os.path.join(root, 'upstream.git')
+    fork = os.path.join(root, 'fork.git')
+    clean = os.path.join(root, 'clean')
+    git('init', '--quiet', '--bare', upstream)
+    git('init', '--quiet', '--bare', fork)
+
+    stream = FastImport(seed)
+    rnd = stream.random
+    tree = {'src/file%03d.c' % i: ['/* file %d line %d */' % (i, l)
+                                   for l in range(FILE_LINES)]
+            for i in range(files)}
+    tree['VERSION'] = ['4.%d.0' % (branches + 9)]
+
+    def snapshot(paths):
+        return {path: file_content(tree[path]) for path in paths}
+
+    # master history; stable branches fork at evenly spaced points
+    fork_points = {history * (i + 1) // (branches + 1): i
+                   for i in range(branches)}
+    stable_names = ['ipa-4-%d' % (branches + 8 - i) for i in range(branches)]
+    mark = stream.commit('refs/heads/master', 'Initial import\n',
+                         snapshot(tree))
+    stable_bases = {}
+    for n in range(1, history):
+        path = 'src/file%03d.c' % rnd.randrange(files)
+        line = rnd.randrange(FILE_LINES // 2)  # PRs use the second half
+        tree[path][line] = '/* changed in commit %d */' % n
+        mark = stream.commit('refs/heads/master',
+                             'Change %s in commit %d\n' % (path, n),
+                             snapshot([path]), parent=mark)
+        if n in fork_points:
+            stable_bases[stable_names[fork_points[n]]] = mark
+    for name in stable_names:
+        base = stable_bases.get(name, mark)
+        for n in range(3):
+            base = stream.commit(
+                'refs/heads/%s' % name,
+                'Bump %s version (%d)\n' % (name, n),
+                {'VERSION': '%s.%d\n' % (name, n)}, parent=base)
+    master_tip = mark
+
+    pull_requests = []
+    for number in range(1, prs + 1):
+        ticket = 7000 + number
+        paths = ['src/file%03d.c' % ((number * 7 + i) % files)
+                 for i in range(pr_commits)]
+        parent = master_tip
+        for i, path in enumerate(paths):
+            line = FILE_LINES // 2 + (number + i) % (FILE_LINES // 2)
+            lines = list(tree[path])
+            lines[line] = '/* fixed by PR %d commit %d */' % (number, i)
+            message = 'PR %d: fix %s\n\nRelated: %s%d\n' % (
+                number, path, ticket_url, ticket)
+            parent = stream.commit(
+                'refs/pr/%d' % number, message,
+                {path: file_content(lines)}, parent=parent,
+                author=CONTRIBUTORS[1])
+        pull_requests.append(number)
+    stream.run(upstream)
+
+    pr_data = []
+    for number in pull_requests:
+        ref = 'refs/pr/%d' % number
+        patches = format_patches(upstream, 'master', ref)
+        commits = []
+        for line in git('--git-dir', upstream, 'rev-list', '--reverse',
+                        '--parents', 'master..%s' % ref).decode().splitlines():
+            sha, parent = line.split()[:2]
+            message = git('--git-dir', upstream, 'log', '-1',
+                          '--format=%B', sha).decode()
+            name, email = CONTRIBUTORS[1]
+            commits.append({'sha': sha, 'parents': [parent],
+                            'message': message, 'patch': patches[sha],
+                            'author_name': name, 'author_email': email})
+        pr_data.append(PullRequest(
+            number=number, title='PR %d' % number, base='master',
+            ticket=7000 + number, commits=commits))
+
+    git('clone', '--quiet', upstream, clean)
+    git('remote', 'add', 'fork', fork, cwd=clean)
+    git('config', 'user.name', 'Carol Maintainer', cwd=clean)
+    git('config', 'user.email', 'carol@example.com', cwd=clean)
+    git('fetch', '--quiet', 'origin', cwd=clean)
+    return Workspace(root=root, upstream=upstream, fork=fork, clean=clean,
+                     branches=['master'] + stable_names,
+                     pull_requests=pr_data)
+
+
+def format_patches(git_dir, base, ref):
+    """Return {sha1: patch text} of commits in base..ref"""
+    output = git('--git-dir', git_dir, 'format-patch', '--stdout',
+                 '%s..%s' % (base, ref)).decode()
+    patches = {}
+    for chunk in re.split(r'^(?=From [0-9a-f]{40} )', output, flags=re.M):
+        if chunk:
+            patches[chunk.split()[1]] = chunk
+    return patches
+
+
+def write_patches(pull_request, directory):
+    """Write the patches of a PullRequest to directory, like `pr-push`"""
+    os.makedirs(directory, exist_ok=True)
+    for i, commit in enumerate(pull_request.commits):
+        path = os.path.join(directory, '%04d-pr%d.patch' % (
+            i + 1, pull_request.number))
+        with open(path, 'w') as f:
+            f.write(commit['patch'])
@@ -11,8 +11,13 @@ AUTHOR_RE = r"^Author: (.+) <(.*)>$"
 DATE_RE = r"^Date:[ ]+(.+)$"
 DESCRIPTION_RE = r"^    (.*)$"
 REVIEWER_RE = r"^\s*Reviewed-By: (.+) <(.+)>$"
-TICKET_RE = r"^\s*[\w: ]*\s*https://fedorahosted.org/freeipa/ticket/(\d+)\s*$"
-TICKET_RE2 = r"^\s*[\w: ]*\s*https://pagure.io/freeipa/issue/(\d+)\s*$"
+# For historical reasons, tickets are referenced with two forms of URLs
+TICKET_URLS = [
+    "https://fedorahosted.org/freeipa/ticket/",
+    "https://pagure.io/freeipa/issue/",
+]
+TICKET_RE = re.compile(r"^\s*[\w: ]*\s*https://(?:%s)(\d+)\s*$" % "|".join(
+    re.escape(url[len("https://"):]) for url in TICKET_URLS))
 RELEASENOTE_RE = r"^\s*RN:\s+(.*)$"
 
 class GitCommit(object):
@@ -145,12 +150,11 @@ class GitInfo():
         return author
 
     def _get_ticket(self, line, commit):
-        for regex in [TICKET_RE, TICKET_RE2]:
-            ticket_g = re.match(regex, line)
-            if ticket_g:
-                ticket_id = ticket_g.groups()[0]
-                commit.author.tickets.add(ticket_id)
-                commit.tickets.add(ticket_id)
+        ticket_g = TICKET_RE.match(line)
+        if ticket_g:
+            ticket_id = ticket_g.groups()[0]
+            commit.author.tickets.add(ticket_id)
+            commit.tickets.add(ticket_id)
 
     def parse_description(self, commit):
 
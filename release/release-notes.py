@@ -51,6 +51,7 @@ or #freeipa channel on libera.chat.
 
 GIT_DIR = None
 PAGURE_REPO = "freeipa"
+BUGZILLA_RE = re.compile(r'https://bugzilla.redhat.com/show_bug.cgi\?id=(\d+)')
 
 
 class OperationError(Exception):
@@ -282,8 +283,7 @@ class App(object):
                 format = "* [https://pagure.io/freeipa/issue/%s #%s] %s"
                 data = (num, num, summary)
                 if rhbz is not None:
-                    bz_list = [re.match(r'https://bugzilla.redhat.com/show_bug.cgi\?id=(\d+)', b)
-                          for b in rhbz.split(',')]
+                    bz_list = [BUGZILLA_RE.match(b) for b in rhbz.split(',')]
                     bz = []
                     for b in bz_list:
                         if b: